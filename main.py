@@ -1,88 +1,160 @@
+import os
+import sys
 import json
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
 import geopandas as gpd
 import pandas as pd 
 import numpy as np
 import pyarrow.parquet as pq
 from src.tessellate import tessellate_bounding_box
-from src.tile_enrichment import spatial_join
+from src.tile_enrichment import ASPECT_LABEL_COLUMNS, prepare_aspect, build_aspects, spatial_join
 from src.summarization import summarization, compute_time_part
-from src.compute_semantic_context import calculate_bow
+from src.compute_semantic_context import compute_context, vectorize_context, fit_vocabulary
 from src.compute_semantic_locations import merge_locations
 from src.clustering import calculate_relevance, assign_taxonomy, clustering_users
 from src.most_common_words import save_most_common_words
 from src.evaluation import calculate_entropy_and_diversity_per_taxonomy
 from src.detect_routine import detect_routine
+from src.routine_evolution import compute_time_spent_per_bucket, detect_routine_per_window
 
-def main(config):
-    # Load the trajectories and tiles GeoDataFrames
-    trajectories_gdf = gpd.read_parquet(config['data']['trajectories'])
-    trajectories_gdf = trajectories_gdf.sort_values(['uid', 'tid', 'datetime'])
-    polygon = gpd.read_parquet(config['data']['tiles'])
+def enrich_tiles(data_config, aspects, output_dir='data'):
+    # Load the tiles GeoDataFrame
+    polygon = gpd.read_parquet(data_config['tiles'])
     
     # Tessellate the bounding box
     tiles_gdf = tessellate_bounding_box(polygon)
-    tiles_gdf.to_parquet('data/tiles.parquet')
+    tiles_gdf.to_parquet(os.path.join(output_dir, 'tiles.parquet'))
     
     # Compute the semantic context
-    #tiles_gdf = gpd.read_parquet('data/tiles.parquet')
+    #tiles_gdf = gpd.read_parquet(os.path.join(output_dir, 'tiles.parquet'))
     
-    poi_gdf = gpd.read_parquet(config['data']['poi'])
-    landuse_gdf = gpd.read_parquet(config['data']['landuse'])
-    pt_gdf = gpd.read_parquet(config['data']['pt'])        
+    enriched_tiles_gdf = spatial_join(tiles_gdf, aspects=aspects)
+    enriched_tiles_gdf.to_parquet(os.path.join(output_dir, 'enriched_tiles.parquet'))    
+    
+    return compute_context(enriched_tiles_gdf)
 
-    enriched_tiles_gdf = spatial_join(tiles_gdf, poi_gdf, landuse_gdf, pt_gdf)
-    enriched_tiles_gdf.to_parquet('data/enriched_tiles.parquet')    
+def detect_region_routines(data_config, context_gdf, output_dir='data', vectorizer=None, windows_config=None):
+    # Load the trajectories GeoDataFrame
+    trajectories_gdf = gpd.read_parquet(data_config['trajectories'])
+    trajectories_gdf = trajectories_gdf.sort_values(['uid', 'tid', 'datetime'])
     
     # Calculate the bag of words for each tile
-    #enriched_tiles_gdf = gpd.read_parquet('data/enriched_tiles.parquet')
-    tiles_with_context_gdf, feature_names = calculate_bow(enriched_tiles_gdf)
+    #context_gdf = compute_context(gpd.read_parquet(os.path.join(output_dir, 'enriched_tiles.parquet')))
+    tiles_with_context_gdf, feature_names = vectorize_context(context_gdf, vectorizer)
     
     # Merge the locations
     semantic_locations = merge_locations(tiles_with_context_gdf, feature_names)
-    semantic_locations.to_parquet('data/semantic_locations.parquet')
-    #semantic_locations = gpd.read_parquet('data/semantic_locations.parquet')
+    semantic_locations.to_parquet(os.path.join(output_dir, 'semantic_locations.parquet'))
+    #semantic_locations = gpd.read_parquet(os.path.join(output_dir, 'semantic_locations.parquet'))
     
-    # Summarization of trajectories
+    # Join the trajectories with the semantic locations
     joined_gdf = trajectories_gdf.sjoin(semantic_locations)
+    
+    # Compute routine and non-routine behaviors over sliding windows
+    if windows_config is not None:
+        time_spent_df = compute_time_spent_per_bucket(joined_gdf, freq=windows_config.get('freq', 'W'), time_column='datetime', user_id_column='uid', trajectory_id_column='tid')
+        contexts = semantic_locations.set_index('new_category')['new_context']
+        routine_windows_df, non_routine_windows_df = detect_routine_per_window(time_spent_df, window=windows_config.get('window', 4), stride=windows_config.get('stride', 1), contexts=contexts, prefix_sums=windows_config.get('prefix_sums', True), user_id_column='uid')
+        routine_windows_df.to_csv(os.path.join(output_dir, 'routine_windows.csv'), index=False)
+        non_routine_windows_df.to_csv(os.path.join(output_dir, 'non_routine_windows.csv'), index=False)
+    
+    # Summarization of trajectories
     summarized_gdf = summarization(joined_gdf,semantic_locations, time_column='datetime', user_id_column='uid', trajectory_id_column='tid')
-    summarized_gdf.to_parquet('data/summarized.parquet')
+    summarized_gdf.to_parquet(os.path.join(output_dir, 'summarized.parquet'))
     
     # Calculate the relevance of each tile for each user
-    #summarized_gdf = gpd.read_parquet('data/summarized.parquet')
+    #summarized_gdf = gpd.read_parquet(os.path.join(output_dir, 'summarized.parquet'))
     summarized_gdf = compute_time_part(summarized_gdf, 'uid', 'tid', 'datetime')
     relevance_gdf = calculate_relevance(summarized_gdf, 'uid')    
     #
     # Assign the labels to the clusters
     relevance_gdf['count'] = relevance_gdf.groupby(['uid','new_category'],as_index=False).count()
     relevance_gdf['relevance'] = relevance_gdf.groupby(['uid','new_category'],as_index=False)['relevance'].sum()
-    relevance_gdf.to_parquet('data/geolife_beijing_summarized_relevance.parquet')
+    relevance_gdf.to_parquet(os.path.join(output_dir, 'geolife_beijing_summarized_relevance.parquet'))
     
-    #relevance_gdf = gpd.read_parquet('data/geolife_beijing_summarized_relevance.parquet')
+    #relevance_gdf = gpd.read_parquet(os.path.join(output_dir, 'geolife_beijing_summarized_relevance.parquet'))
     relevance_gdf = relevance_gdf.groupby(['uid','new_category'],as_index=False).agg({'relevance':'sum','bag_of_words':'first','context':'first'})
     labeled_gdf = assign_taxonomy(relevance_gdf, 'uid', 'relevance')  
     
     labeled_gdf['bag_of_words'] = semantic_locations['new_bag_of_words']
     labeled_gdf.reset_index(inplace=True)
-    labeled_gdf.to_parquet('data/geolife_beijing_summarized_taxonomy.parquet')
+    labeled_gdf.to_parquet(os.path.join(output_dir, 'geolife_beijing_summarized_taxonomy.parquet'))
     
     # Compute the entropy and diversity for each user
-    #labeled_gdf = gpd.read_parquet('data/geolife_beijing_summarized_taxonomy.parquet')
+    #labeled_gdf = gpd.read_parquet(os.path.join(output_dir, 'geolife_beijing_summarized_taxonomy.parquet'))
     entropy_diversity_df = calculate_entropy_and_diversity_per_taxonomy(labeled_gdf, user_id_column='uid', taxonomy_column='taxonomy', context_column='new_context', category_column='new_category')
-    entropy_diversity_df.to_csv('data/entropy_diversity.csv', index=False)
+    entropy_diversity_df.to_csv(os.path.join(output_dir, 'entropy_diversity.csv'), index=False)
     
     # Compute routine and non-routine behaviors
-    #entropy_diversity_df = pd.read_csv('data/entropy_diversity.csv')
+    #entropy_diversity_df = pd.read_csv(os.path.join(output_dir, 'entropy_diversity.csv'))
     routine_df, non_routine_df = detect_routine(entropy_diversity_df, taxonomy_column='taxonomy', user_id_column='uid')
-    routine_df.to_csv('data/routine.csv', index=False)
-    non_routine_df.to_csv('data/non_routine.csv', index=False)
+    routine_df.to_csv(os.path.join(output_dir, 'routine.csv'), index=False)
+    non_routine_df.to_csv(os.path.join(output_dir, 'non_routine.csv'), index=False)
     
-    #labeled_gdf = gpd.read_parquet('data/geolife_beijing_summarized_taxonomy.parquet')    
+    #labeled_gdf = gpd.read_parquet(os.path.join(output_dir, 'geolife_beijing_summarized_taxonomy.parquet'))    
     most_common_df = save_most_common_words(labeled_gdf,feature_names,'uid','taxonomy')
     # Save the DataFrame to a CSV file
-    most_common_df.to_csv('data/most_common_words.csv', index=False)
+    most_common_df.to_csv(os.path.join(output_dir, 'most_common_words.csv'), index=False)
+
+def main(config, output_dir='data'):
+    os.makedirs(output_dir, exist_ok=True)
+
+    poi_gdf = gpd.read_parquet(config['data']['poi'])
+    landuse_gdf = gpd.read_parquet(config['data']['landuse'])
+    pt_gdf = gpd.read_parquet(config['data']['pt'])
+
+    context_gdf = enrich_tiles(config['data'], build_aspects(poi_gdf, landuse_gdf, pt_gdf), output_dir)
+    detect_region_routines(config['data'], context_gdf, output_dir, windows_config=config.get('windows'))
+
+def main_batch(config):
+    regions = config['regions']
+    if not regions:
+        raise ValueError("No region to process")
+
+    output_dirs = [region.get('output_dir', os.path.join('data', region['name'])) for region in regions]
+    if len(set(os.path.abspath(output_dir) for output_dir in output_dirs)) < len(output_dirs):
+        raise ValueError("Each region must have its own output directory")
+
+    max_workers = config.get('max_workers', min(len(regions), os.cpu_count() or 1))
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+
+    for output_dir in output_dirs:
+        os.makedirs(output_dir, exist_ok=True)
+
+    # Load and spatially index each semantic layer only once, even if it is shared by several regions
+    # (e.g. a national POI file): only its geometry and label are kept, and the raw layer is released
+    aspects = {}
+    region_aspects = []
+    for region in regions:
+        region_aspects.append([])
+        for name, label_column in ASPECT_LABEL_COLUMNS.items():
+            key = (os.path.realpath(region['data'][name]), label_column)
+            if key not in aspects:
+                aspects[key] = prepare_aspect(gpd.read_parquet(region['data'][name]), label_column)
+            region_aspects[-1].append(aspects[key])
+
+    # The regions are enriched in threads sharing the indexed layers. Only the spatial joins release the GIL,
+    # so the tessellation and the computation of the contexts of different regions do not run in parallel
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        context_gdfs = list(executor.map(enrich_tiles, [region['data'] for region in regions], region_aspects, output_dirs))
+    del aspects, region_aspects
+
+    # Build a single vocabulary, so that the bag of words are comparable across regions
+    vectorizer = fit_vocabulary(context_gdfs)
+
+    # The rest of the pipeline is mostly pure Python, so the regions are processed in separate processes
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(partial(detect_region_routines, vectorizer=vectorizer, windows_config=config.get('windows')),
+                          [region['data'] for region in regions], context_gdfs, output_dirs))
     
     
 if __name__ == "__main__":
-    with open('config.json') as f:
+    config_path = sys.argv[1] if len(sys.argv) > 1 else 'config.json'
+    with open(config_path) as f:
         config = json.load(f)
-    main(config)
+    if 'regions' in config:
+        main_batch(config)
+    else:
+        main(config)
@@ -3,17 +3,16 @@ from sklearn.feature_extraction.text import CountVectorizer
 import pandas as pd
 import geopandas as gpd
 
-def calculate_bow(tiles_gdf, category_column='label'):
+def compute_context(tiles_gdf, category_column='label'):
     """
-    This function assigns to each semantically enriched tile a list of all the categories that fall into the tile 
-    and calculates the corresponding bag of words vector.
+    This function assigns to each semantically enriched tile the list of all the categories that fall into the tile.
     
     Parameters:
     tiles_gdf (GeoDataFrame): A GeoDataFrame representing the semantically enriched tiles.
     category_column (str, optional): The column in the GeoDataFrame that contains the categories.
 
     Returns:
-    GeoDataFrame: A GeoDataFrame with an additional column for the bag of words vector.
+    GeoDataFrame: A GeoDataFrame indexed by locationID with an additional column for the context.
     """
     # Ensure the tiles GeoDataFrame is in the correct format
     assert isinstance(tiles_gdf, gpd.GeoDataFrame), "Input must be a GeoDataFrame"
@@ -31,15 +30,48 @@ def calculate_bow(tiles_gdf, category_column='label'):
     # Create a new column 'context' that contains a list of all categories for each tile
     tiles_gdf['context'] = tiles_gdf.groupby('locationID')[category_column].apply(lambda x: ' '.join(x))
     
-    # Initialize a CountVectorizer
+    return tiles_gdf
+
+def fit_vocabulary(context_gdfs):
+    """
+    This function fits a single CountVectorizer on the contexts of several sets of semantically enriched tiles,
+    e.g. one per region, so that the bag of words vectors computed with it are comparable.
+    
+    Parameters:
+    context_gdfs (list): A list of GeoDataFrames computed with compute_context.
+
+    Returns:
+    CountVectorizer: The fitted CountVectorizer.
+    """
     vectorizer = CountVectorizer()
+    vectorizer.fit(pd.concat([context_gdf['context'] for context_gdf in context_gdfs]))
+    
+    return vectorizer
+
+def vectorize_context(context_gdf, vectorizer=None):
+    """
+    This function calculates the bag of words vector of each tile from the context computed with compute_context.
+    
+    Parameters:
+    context_gdf (GeoDataFrame): A GeoDataFrame computed with compute_context.
+    vectorizer (CountVectorizer, optional): A CountVectorizer already fitted with fit_vocabulary.
+        If not given, a new one is fitted on the tiles.
+
+    Returns:
+    GeoDataFrame: A GeoDataFrame with an additional column for the bag of words vector.
+    """
+    tiles_gdf = context_gdf.reset_index()
     
     # Compute the bag of words for each tile
-    X = vectorizer.fit_transform(tiles_gdf['context'])
+    if vectorizer is None:
+        # Initialize a CountVectorizer
+        vectorizer = CountVectorizer()
+        X = vectorizer.fit_transform(tiles_gdf['context'])
+    else:
+        X = vectorizer.transform(tiles_gdf['context'])
     bag_of_words = X.toarray()
     tiles_gdf['bow'] = bag_of_words.tolist()
     
-    tiles_gdf = tiles_gdf.reset_index()
     tiles_gdf = tiles_gdf.drop_duplicates(subset='locationID')
     tiles_gdf = tiles_gdf[['locationID', 'geometry', 'context', 'bow']]
     
@@ -47,3 +79,19 @@ def calculate_bow(tiles_gdf, category_column='label'):
     feature_names = vectorizer.get_feature_names_out()
     
     return tiles_gdf, feature_names
+
+def calculate_bow(tiles_gdf, category_column='label', vectorizer=None):
+    """
+    This function assigns to each semantically enriched tile a list of all the categories that fall into the tile 
+    and calculates the corresponding bag of words vector.
+    
+    Parameters:
+    tiles_gdf (GeoDataFrame): A GeoDataFrame representing the semantically enriched tiles.
+    category_column (str, optional): The column in the GeoDataFrame that contains the categories.
+    vectorizer (CountVectorizer, optional): A CountVectorizer already fitted with fit_vocabulary.
+        If not given, a new one is fitted on the tiles.
+
+    Returns:
+    GeoDataFrame: A GeoDataFrame with an additional column for the bag of words vector.
+    """
+    return vectorize_context(compute_context(tiles_gdf, category_column), vectorizer)
@@ -16,8 +16,8 @@ def detect_routine(df, taxonomy_column='taxonomy', user_id_column='uid'):
     df.reset_index(inplace=True)
     df.sort_values(by=[user_id_column,'entropy'],inplace=True) 
     
-    min_entropy = df.groupby(user_id_column).first()
-    max_entropy = df.groupby(user_id_column).last()
+    min_entropy = df.groupby(user_id_column, as_index=False).first()
+    max_entropy = df.groupby(user_id_column, as_index=False).last()
     
     max_entropy_sig = max_entropy[max_entropy['taxonomy']=='Significant locations']
     max_entropy_trans = max_entropy[max_entropy['taxonomy']=='Transit locations']
@@ -0,0 +1,193 @@
+import pandas as pd
+import numpy as np
+from scipy.sparse import csr_matrix
+
+def compute_time_spent_per_bucket(joined_gdf, freq='W', time_column='datetime', user_id_column='uid', trajectory_id_column='tid', category_column='new_category'):
+    """
+    This function calculates the time spent and the number of points of each user in each semantic location,
+    for each time bucket (e.g. week or month) of the history.
+
+    Parameters:
+    joined_gdf (GeoDataFrame): A GeoDataFrame representing the trajectories joined with the semantic locations.
+    freq (str, optional): The pandas period frequency of the time buckets, e.g. 'W' or 'M'.
+    time_column (str, optional): The column in the GeoDataFrame that contains the time.
+    user_id_column (str, optional): The column in the GeoDataFrame that contains the user ids.
+    trajectory_id_column (str, optional): The column in the GeoDataFrame that contains the trajectory ids.
+    category_column (str, optional): The column in the GeoDataFrame that contains the semantic location ids.
+
+    Returns:
+    DataFrame: A DataFrame with the time spent (in seconds) and the number of points per user, bucket and location.
+    """
+    joined_gdf = joined_gdf.sort_values([user_id_column, trajectory_id_column, time_column])
+
+    # Calculate the time difference in seconds between two consecutive points, as in summarization
+    time_diff = joined_gdf.groupby([user_id_column, trajectory_id_column])[time_column].diff()
+
+    df = pd.DataFrame({
+        user_id_column: joined_gdf[user_id_column],
+        'bucket': joined_gdf[time_column].dt.to_period(freq),
+        category_column: joined_gdf[category_column],
+        'time_spent': time_diff.dt.total_seconds().fillna(0),
+        'points': 1
+    })
+    df = df.dropna(subset=[category_column])
+
+    return df.groupby([user_id_column, 'bucket', category_column], as_index=False)[['time_spent', 'points']].sum()
+
+def detect_routine_per_window(time_spent_df, window=4, stride=1, contexts=None, prefix_sums=True, user_id_column='uid', category_column='new_category'):
+    """
+    This function detects the routine of each user over sliding windows of time buckets.
+    For each window, the relevance, the taxonomy, the entropy and the diversity are computed as in
+    calculate_relevance, assign_taxonomy and calculate_entropy_and_diversity_per_taxonomy, and the
+    routine and non-routine taxonomies are selected as in detect_routine. The time spent in each window is obtained
+    either from prefix sums over the buckets, so each window costs a subtraction, or by adding the buckets entering
+    the window and removing the ones leaving it.
+
+    If the last window starting every stride buckets does not reach the last bucket, a final window ending
+    at the last bucket is added, so that the most recent buckets are always included.
+
+    Parameters:
+    time_spent_df (DataFrame): A DataFrame computed with compute_time_spent_per_bucket.
+    window (int, optional): The number of buckets in each window.
+    stride (int, optional): The number of buckets between the start of two consecutive windows.
+    contexts (Series, optional): The context (list of words) of each semantic location, indexed by location id.
+        If not given, the diversity is not computed.
+    prefix_sums (bool, optional): Whether to use prefix sums, stored densely with a memory that grows with the number
+        of (user, location) pairs times the number of buckets. If False, the windows are updated by adding and removing
+        buckets, with a memory that grows with the number of non-zero (user, bucket, location) counts, at the cost of
+        a slower update when the stride is large.
+    user_id_column (str, optional): The column in the DataFrame that contains the user ids.
+    category_column (str, optional): The column in the DataFrame that contains the semantic location ids.
+
+    Returns:
+    DataFrame: A DataFrame with the routine of each user in each window.
+    DataFrame: A DataFrame with the non routine of each user in each window.
+    """
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    if stride < 1:
+        raise ValueError("stride must be at least 1")
+
+    labels = ["Insignificant locations", "Sporadic locations", "Transit locations", "Significant locations"]
+    columns = [user_id_column, 'window_start', 'window_end', 'taxonomy', 'entropy', 'diversity']
+
+    if time_spent_df.empty:
+        return pd.DataFrame(columns=columns), pd.DataFrame(columns=columns)
+
+    # Index the (user, location) pairs and the buckets
+    counts = time_spent_df.groupby([user_id_column, category_column, 'bucket'])[['time_spent', 'points']].sum()
+    pair_index = counts.index.droplevel('bucket')
+    pairs = pair_index.unique()
+    bucket_values = counts.index.get_level_values('bucket')
+    buckets = pd.period_range(bucket_values.min(), bucket_values.max(), freq=bucket_values.freq)
+
+    pair_codes = pairs.get_indexer(pair_index)
+    bucket_codes = buckets.get_indexer(bucket_values)
+    if prefix_sums:
+        # Bucket x (user, location) prefix sums: the total of a window [start, end) is cumulative[end] - cumulative[start]
+        cumulative_time_spent = np.zeros((len(buckets) + 1, len(pairs)))
+        cumulative_points = np.zeros((len(buckets) + 1, len(pairs)), dtype=np.int32)
+        cumulative_time_spent[bucket_codes + 1, pair_codes] = counts['time_spent'].values
+        cumulative_points[bucket_codes + 1, pair_codes] = counts['points'].values
+        # Accumulate in place, one contiguous row per bucket
+        for bucket in range(1, len(buckets) + 1):
+            cumulative_time_spent[bucket] += cumulative_time_spent[bucket - 1]
+            cumulative_points[bucket] += cumulative_points[bucket - 1]
+    else:
+        # Counts sorted by bucket: the counts of the buckets [start, end) are at offsets[start]:offsets[end]
+        order = np.argsort(bucket_codes, kind='stable')
+        sorted_pair_codes = pair_codes[order]
+        sorted_time_spent = counts['time_spent'].values[order]
+        sorted_points = counts['points'].values[order]
+        offsets = np.searchsorted(bucket_codes[order], np.arange(len(buckets) + 1))
+
+        window_time_spent = np.zeros(len(pairs))
+        window_points = np.zeros(len(pairs), dtype=np.int64)
+        previous_start, previous_end = 0, 0
+
+    user_codes, users = pd.factorize(pairs.get_level_values(0))
+
+    # Binary (user, location) x word matrix, to compute the number of distinct words in a group of locations
+    if contexts is not None:
+        pair_contexts = contexts.reindex(pairs.get_level_values(1))
+        words_per_pair = pd.Series(list(pair_contexts)).explode().dropna()
+        word_codes, words = pd.factorize(words_per_pair)
+        rows = words_per_pair.index.values
+        word_matrix = csr_matrix((np.ones(len(rows)), (rows, word_codes)), shape=(len(pairs), len(words)))
+
+    starts = list(range(0, max(len(buckets) - window, 0) + 1, stride))
+    if starts[-1] + window < len(buckets):
+        starts.append(len(buckets) - window)
+
+    results = []
+    for start in starts:
+        end = min(start + window, len(buckets))
+
+        if prefix_sums:
+            window_time_spent = cumulative_time_spent[end] - cumulative_time_spent[start]
+            window_points = cumulative_points[end] - cumulative_points[start]
+        else:
+            # Remove the buckets leaving the window and add the ones entering it
+            for first, last, sign in [(previous_start, min(start, previous_end), -1), (max(previous_end, start), end, 1)]:
+                if first < last:
+                    update = slice(offsets[first], offsets[last])
+                    np.add.at(window_time_spent, sorted_pair_codes[update], sign * sorted_time_spent[update])
+                    np.add.at(window_points, sorted_pair_codes[update], sign * sorted_points[update])
+            previous_start, previous_end = start, end
+
+        present = window_points > 0
+        if not present.any():
+            continue
+        present_pairs = np.flatnonzero(present)
+        present_users = user_codes[present]
+
+        # Calculate the relevance
+        user_time_spent = np.bincount(present_users, weights=window_time_spent[present], minlength=len(users))
+        relevance = np.divide(window_time_spent[present], user_time_spent[present_users],
+                              out=np.zeros(len(present_pairs)), where=user_time_spent[present_users] > 0)
+
+        # Assign the taxonomy with the percentiles of the window
+        percentiles = np.percentile(relevance, [25, 50, 75])
+        taxonomy = np.searchsorted(percentiles, relevance, side='left')
+
+        # Each location appears once per user and taxonomy, so the entropy is the log of the number of locations
+        groups, group_codes, group_sizes = np.unique(present_users * len(labels) + taxonomy, return_inverse=True, return_counts=True)
+
+        window_df = pd.DataFrame({
+            user_id_column: users[groups // len(labels)],
+            'window_start': buckets[start].start_time,
+            'window_end': buckets[end - 1].end_time,
+            'taxonomy': np.array(labels)[groups % len(labels)],
+            'entropy': np.log(group_sizes)
+        })
+
+        if contexts is not None:
+            group_matrix = csr_matrix((np.ones(len(present_pairs)), (group_codes, present_pairs)), shape=(len(groups), len(pairs)))
+            window_df['diversity'] = np.asarray(((group_matrix @ word_matrix) > 0).sum(axis=1)).ravel()
+
+        results.append(window_df)
+
+    if not results:
+        return pd.DataFrame(columns=columns), pd.DataFrame(columns=columns)
+
+    df = pd.concat(results, ignore_index=True)
+
+    # Compute the percentage of diversity
+    if contexts is not None:
+        df['diversity'] = df['diversity'] / df.groupby(['window_start', user_id_column])['diversity'].transform('sum')
+    else:
+        df['diversity'] = np.nan
+
+    df.sort_values(by=['window_start', user_id_column, 'entropy'], kind='stable', inplace=True)
+
+    min_entropy = df.groupby(['window_start', user_id_column]).head(1)
+    max_entropy = df.groupby(['window_start', user_id_column]).tail(1)
+
+    # Keep the significant and transit locations, as in detect_routine
+    routine_df = min_entropy[min_entropy['taxonomy'].isin(['Significant locations', 'Transit locations'])]
+    routine_df = routine_df.sort_values([user_id_column, 'window_start'])[columns]
+
+    non_routine_df = max_entropy[max_entropy['taxonomy'].isin(['Significant locations', 'Transit locations'])]
+    non_routine_df = non_routine_df.sort_values([user_id_column, 'window_start'])[columns]
+
+    return routine_df, non_routine_df
@@ -2,7 +2,48 @@
 import geopandas as gpd
 import pandas as pd
 
-def spatial_join(tiles_gdf, poi_gdf=None, landuse_gdf=None, pt_gdf=None):
+# Column that contains the label of each semantic aspect
+ASPECT_LABEL_COLUMNS = {'poi': 'label', 'landuse': 'POI category', 'pt': 'label'}
+
+def prepare_aspect(aspect_gdf, label_column='label'):
+    """
+    This function keeps only the geometry and the label of a semantic aspect (Points of Interest, land use
+    or public transport) and builds its spatial index, so that it can be joined with several sets of tiles.
+
+    Parameters:
+    aspect_gdf (GeoDataFrame): A GeoDataFrame representing the aspect.
+    label_column (str, optional): The column in the GeoDataFrame that contains the label.
+
+    Returns:
+    GeoDataFrame: A GeoDataFrame with the geometry and the label of the aspect.
+    """
+    assert isinstance(aspect_gdf, gpd.GeoDataFrame), "Input must be a GeoDataFrame"
+
+    aspect_gdf = aspect_gdf[['geometry', label_column]].rename(columns={label_column:'label'})
+    aspect_gdf = gpd.GeoDataFrame(aspect_gdf, geometry='geometry')
+
+    # Build the spatial index now, so that it is shared by all the joins with this aspect
+    aspect_gdf.sindex
+
+    return aspect_gdf
+
+def build_aspects(poi_gdf=None, landuse_gdf=None, pt_gdf=None):
+    """
+    This function prepares the Points of Interest, land use and public transport GeoDataFrames with prepare_aspect.
+
+    Parameters:
+    poi_gdf (GeoDataFrame, optional): A GeoDataFrame representing Points of Interest.
+    landuse_gdf (GeoDataFrame, optional): A GeoDataFrame representing land use.
+    pt_gdf (GeoDataFrame, optional): A GeoDataFrame representing public transport.
+
+    Returns:
+    list: A list with the prepared aspects that are not None.
+    """
+    aspect_gdfs = {'poi': poi_gdf, 'landuse': landuse_gdf, 'pt': pt_gdf}
+
+    return [prepare_aspect(aspect_gdf, ASPECT_LABEL_COLUMNS[name]) for name, aspect_gdf in aspect_gdfs.items() if aspect_gdf is not None]
+
+def spatial_join(tiles_gdf, poi_gdf=None, landuse_gdf=None, pt_gdf=None, aspects=None):
     """
     This function performs a spatial join between the tiles GeoDataFrame and three other GeoDataFrames.
     
@@ -11,46 +52,27 @@ def spatial_join(tiles_gdf, poi_gdf=None, landuse_gdf=None, pt_gdf=None):
     poi_gdf (GeoDataFrame, optional): A GeoDataFrame representing Points of Interest.
     landuse_gdf (GeoDataFrame, optional): A GeoDataFrame representing land use.
     pt_gdf (GeoDataFrame, optional): A GeoDataFrame representing public transport.
+    aspects (list, optional): The aspects already prepared with prepare_aspect. If given,
+        poi_gdf, landuse_gdf and pt_gdf are ignored.
 
     Returns:
     GeoDataFrame: A GeoDataFrame resulting from the spatial join.
     """
     # Ensure the tiles GeoDataFrame is in the correct format
     assert isinstance(tiles_gdf, gpd.GeoDataFrame), "Input must be a GeoDataFrame"
-    assert isinstance(poi_gdf, gpd.GeoDataFrame), "Input must be a GeoDataFrame"
-    assert isinstance(landuse_gdf, gpd.GeoDataFrame), "Input must be a GeoDataFrame"
-    assert isinstance(pt_gdf, gpd.GeoDataFrame), "Input must be a GeoDataFrame"
     
-    if landuse_gdf is not None:
-        landuse_gdf = landuse_gdf[['geometry', 'POI category']]
-        landuse_gdf.rename(columns={'POI category':'label'}, inplace=True) 
-        
-    if poi_gdf is None and landuse_gdf is None and pt_gdf is None:
+    if aspects is None:
+        assert isinstance(poi_gdf, gpd.GeoDataFrame), "Input must be a GeoDataFrame"
+        assert isinstance(landuse_gdf, gpd.GeoDataFrame), "Input must be a GeoDataFrame"
+        assert isinstance(pt_gdf, gpd.GeoDataFrame), "Input must be a GeoDataFrame"
+
+        aspects = build_aspects(poi_gdf, landuse_gdf, pt_gdf)
+
+    if not aspects:
         return tiles_gdf
-    elif poi_gdf is not None and landuse_gdf is None and pt_gdf is None:
-        aspects = poi_gdf.copy()
-    elif poi_gdf is None and landuse_gdf is not None and pt_gdf is None:
-        aspects = landuse_gdf.copy()
-    elif poi_gdf is None and landuse_gdf is None and pt_gdf is not None:
-        aspects = pt_gdf.copy()
-    elif poi_gdf is not None and landuse_gdf is not None and pt_gdf is None:
-        aspects = poi_gdf.copy()
-        aspects = pd.concat([aspects,landuse_gdf])
-    elif poi_gdf is not None and landuse_gdf is None and pt_gdf is not None:
-        aspects = poi_gdf.copy()
-        aspects = pd.concat([aspects,pt_gdf])
-    elif poi_gdf is None and landuse_gdf is not None and pt_gdf is not None:
-        aspects = landuse_gdf.copy()
-        aspects = pd.concat([aspects,pt_gdf])
-    else:
-        aspects = poi_gdf.copy()
-        aspects = pd.concat([aspects,landuse_gdf])
-        aspects = pd.concat([aspects,pt_gdf])
-        
-    aspects = gpd.GeoDataFrame(aspects, geometry='geometry')
-    
-    # Perform spatial join with each GeoDataFrame if it is not None
-    enriched_tiles = gpd.sjoin(tiles_gdf, aspects)
+
+    # Join the tiles with each aspect separately, so that the spatial index of each aspect is reused
+    enriched_tiles = pd.concat([gpd.sjoin(tiles_gdf, aspect_gdf) for aspect_gdf in aspects])
     enriched_tiles = enriched_tiles[['locationID', 'geometry', 'label']]
     
     return enriched_tiles
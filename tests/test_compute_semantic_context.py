@@ -0,0 +1,27 @@
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import box
+
+from src.compute_semantic_context import compute_context, fit_vocabulary, vectorize_context
+
+
+def make_enriched_tiles(labels_per_tile):
+    rows = [(location_id, label) for location_id, labels in labels_per_tile.items() for label in labels]
+    return gpd.GeoDataFrame({'locationID': [location_id for location_id, _ in rows], 'label': [label for _, label in rows]},
+                            geometry=[box(0, 0, 1, 1)] * len(rows))
+
+
+def test_shared_vocabulary_aligns_regions():
+    region_a = make_enriched_tiles({'a1': ['school', 'bar', 'bar'], 'a2': ['park']})
+    region_b = make_enriched_tiles({'b1': ['bus stop', 'school'], 'b2': ['food-court']})
+
+    context_gdfs = [compute_context(region_a), compute_context(region_b)]
+    vectorizer = fit_vocabulary(context_gdfs)
+    (tiles_a, feature_names_a), (tiles_b, feature_names_b) = [vectorize_context(context_gdf, vectorizer) for context_gdf in context_gdfs]
+
+    assert list(feature_names_a) == list(feature_names_b) == ['bar', 'bus_stop', 'food_court', 'park', 'school']
+
+    bow_a = dict(zip(tiles_a['locationID'], tiles_a['bow']))
+    bow_b = dict(zip(tiles_b['locationID'], tiles_b['bow']))
+    assert bow_a == {'a1': [2, 0, 0, 0, 1], 'a2': [0, 0, 0, 1, 0]}
+    assert bow_b == {'b1': [0, 1, 0, 0, 1], 'b2': [0, 0, 1, 0, 0]}
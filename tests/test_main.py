@@ -0,0 +1,27 @@
+import pytest
+
+from main import main_batch
+
+
+def make_region(name, output_dir=None):
+    region = {'name': name, 'data': {}}
+    if output_dir is not None:
+        region['output_dir'] = output_dir
+    return region
+
+
+def test_main_batch_rejects_no_regions():
+    with pytest.raises(ValueError, match='No region'):
+        main_batch({'regions': []})
+
+
+def test_main_batch_rejects_no_workers(tmp_path):
+    regions = [make_region('a', str(tmp_path / 'a'))]
+    with pytest.raises(ValueError, match='max_workers'):
+        main_batch({'regions': regions, 'max_workers': 0})
+
+
+def test_main_batch_rejects_shared_output_dir(tmp_path):
+    regions = [make_region('a', str(tmp_path / 'out')), make_region('b', str(tmp_path / 'x' / '..' / 'out'))]
+    with pytest.raises(ValueError, match='output directory'):
+        main_batch({'regions': regions})
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.clustering import calculate_relevance, assign_taxonomy
+from src.evaluation import calculate_entropy_and_diversity_per_taxonomy
+from src.detect_routine import detect_routine
+from src.routine_evolution import detect_routine_per_window
+
+# Time spent by each user in each location. Both users spend 602 seconds in total, and the times are chosen so that
+# every user has locations in each taxonomy, with a different number of locations per taxonomy (no entropy ties)
+TIME_SPENT = {
+    'a': [1, 20, 21, 50, 51, 52, 100, 101, 102, 104],
+    'b': [2, 3, 4, 5, 22, 23, 24, 53, 54, 412],
+}
+
+CONTEXTS = pd.Series({category: [f'w{category % 3}', f'w{category % 5}'] for category in range(10)})
+
+
+def make_time_spent_df(n_buckets=2):
+    buckets = pd.period_range('2020-01-06', periods=n_buckets, freq='W')
+    rows = []
+    for uid, times in TIME_SPENT.items():
+        for category, time_spent in enumerate(times):
+            rows.append({'uid': uid, 'bucket': buckets[category % n_buckets], 'new_category': category,
+                         'time_spent': float(time_spent), 'points': 1})
+    return pd.DataFrame(rows)
+
+
+def make_random_time_spent_df(n_users=4, n_categories=10, n_buckets=8, seed=0):
+    rng = np.random.default_rng(seed)
+    buckets = pd.period_range('2020-01-06', periods=n_buckets, freq='W')
+    rows = []
+    for uid in range(n_users):
+        for bucket in buckets:
+            for category in range(n_categories):
+                if rng.random() < 0.6:
+                    rows.append({'uid': uid, 'bucket': bucket, 'new_category': category,
+                                 'time_spent': float(rng.integers(1, 1000)), 'points': int(rng.integers(1, 5))})
+    return pd.DataFrame(rows)
+
+
+def detect_routine_from_scratch(time_spent_df):
+    """
+    Run the full-history pipeline (calculate_relevance, assign_taxonomy,
+    calculate_entropy_and_diversity_per_taxonomy and detect_routine) on time_spent_df.
+    """
+    relevance_df = time_spent_df.groupby(['uid', 'new_category'], as_index=False)['time_spent'].sum()
+    relevance_df['time_spent'] = pd.to_timedelta(relevance_df['time_spent'], unit='s')
+    relevance_df = calculate_relevance(relevance_df, 'uid')
+    labeled_df = assign_taxonomy(relevance_df, 'uid', 'relevance')
+    labeled_df['new_context'] = labeled_df['new_category'].map(CONTEXTS)
+    entropy_diversity_df = calculate_entropy_and_diversity_per_taxonomy(labeled_df, user_id_column='uid', taxonomy_column='taxonomy', context_column='new_context', category_column='new_category')
+
+    # Keep only the taxonomies that the user has, whatever the pandas default for unobserved categories
+    observed = set(zip(labeled_df['uid'], labeled_df['taxonomy'].astype(str)))
+    entropy_diversity_df = entropy_diversity_df[[(uid, str(taxonomy)) in observed for uid, taxonomy in entropy_diversity_df.index]]
+
+    return detect_routine(entropy_diversity_df, taxonomy_column='taxonomy', user_id_column='uid')
+
+
+def assert_same_routines(result_df, expected_df):
+    expected_df = expected_df.assign(taxonomy=expected_df['taxonomy'].astype(str)).sort_values('uid').reset_index(drop=True)
+    result_df = result_df[['uid', 'taxonomy', 'entropy', 'diversity']].reset_index(drop=True)
+    pd.testing.assert_frame_equal(result_df, expected_df, check_dtype=False)
+
+
+@pytest.mark.parametrize('prefix_sums', [True, False])
+def test_full_history_window_matches_detect_routine(prefix_sums):
+    time_spent_df = make_time_spent_df()
+
+    expected = detect_routine_from_scratch(time_spent_df)
+    result = detect_routine_per_window(time_spent_df, window=2, stride=1, contexts=CONTEXTS, prefix_sums=prefix_sums)
+
+    for expected_df, result_df in zip(expected, result):
+        assert (result_df['window_start'] == pd.Timestamp('2020-01-06')).all()
+        assert not expected_df.empty
+        assert_same_routines(result_df, expected_df)
+
+
+@pytest.mark.parametrize('prefix_sums', [True, False])
+@pytest.mark.parametrize('window, stride', [(3, 2), (3, 1), (2, 3)])
+def test_sliding_windows_match_recomputation(window, stride, prefix_sums):
+    time_spent_df = make_random_time_spent_df()
+    buckets = pd.period_range(time_spent_df['bucket'].min(), time_spent_df['bucket'].max(), freq='W')
+
+    routine_df, non_routine_df = detect_routine_per_window(time_spent_df, window=window, stride=stride, contexts=CONTEXTS, prefix_sums=prefix_sums)
+
+    starts = list(range(0, len(buckets) - window + 1, stride))
+    if starts[-1] + window < len(buckets):
+        starts.append(len(buckets) - window)
+    assert sorted(pd.concat([routine_df, non_routine_df])['window_start'].unique()) == [buckets[start].start_time for start in starts]
+
+    for start in starts:
+        window_buckets = buckets[start:start + window]
+        expected = detect_routine_from_scratch(time_spent_df[time_spent_df['bucket'].isin(window_buckets)])
+        for expected_df, result_df in zip(expected, (routine_df, non_routine_df)):
+            result_df = result_df[result_df['window_start'] == window_buckets[0].start_time]
+            assert (result_df['window_end'] == window_buckets[-1].end_time).all()
+            assert_same_routines(result_df, expected_df)
+
+
+def test_last_buckets_are_always_in_a_window():
+    routine_df, non_routine_df = detect_routine_per_window(make_time_spent_df(n_buckets=6), window=4, stride=4)
+
+    window_starts = pd.concat([routine_df, non_routine_df])['window_start'].unique()
+    assert sorted(window_starts) == [pd.Timestamp('2020-01-06'), pd.Timestamp('2020-01-20')]
+
+
+def test_empty_input():
+    routine_df, non_routine_df = detect_routine_per_window(make_time_spent_df().iloc[:0])
+
+    assert routine_df.empty and non_routine_df.empty
+
+
+@pytest.mark.parametrize('window, stride', [(0, 1), (1, 0)])
+def test_invalid_window(window, stride):
+    with pytest.raises(ValueError):
+        detect_routine_per_window(make_time_spent_df(), window=window, stride=stride)
@@ -0,0 +1,44 @@
+from collections import Counter
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import Point, box
+
+from src.tile_enrichment import build_aspects, spatial_join
+
+
+def make_tiles():
+    return gpd.GeoDataFrame({'locationID': [f'{i}_{j}' for i in range(4) for j in range(4)]},
+                            geometry=[box(i, j, i + 1, j + 1) for i in range(4) for j in range(4)])
+
+
+def make_points(rng, n, label_column, labels):
+    return gpd.GeoDataFrame({label_column: rng.choice(labels, n), 'other': np.arange(n)},
+                            geometry=[Point(x, y) for x, y in rng.uniform(0, 4, (n, 2))])
+
+
+def spatial_join_concatenated(tiles_gdf, poi_gdf, landuse_gdf, pt_gdf):
+    """
+    The spatial join as it was done before the aspects were joined separately:
+    one join with the concatenation of all the aspects.
+    """
+    landuse_gdf = landuse_gdf[['geometry', 'POI category']].rename(columns={'POI category': 'label'})
+    aspects = gpd.GeoDataFrame(pd.concat([poi_gdf, landuse_gdf, pt_gdf]), geometry='geometry')
+    return gpd.sjoin(tiles_gdf, aspects)[['locationID', 'geometry', 'label']]
+
+
+def test_spatial_join_matches_concatenated_join():
+    rng = np.random.default_rng(0)
+    tiles_gdf = make_tiles()
+    poi_gdf = make_points(rng, 100, 'label', ['bar', 'food court', 'school'])
+    landuse_gdf = make_points(rng, 30, 'POI category', ['park', 'residential'])
+    pt_gdf = make_points(rng, 20, 'label', ['bus stop'])
+
+    expected = Counter(zip(*spatial_join_concatenated(tiles_gdf, poi_gdf, landuse_gdf, pt_gdf)[['locationID', 'label']].values.T))
+
+    result = spatial_join(tiles_gdf, poi_gdf, landuse_gdf, pt_gdf)
+    assert Counter(zip(*result[['locationID', 'label']].values.T)) == expected
+
+    result = spatial_join(tiles_gdf, aspects=build_aspects(poi_gdf, landuse_gdf, pt_gdf))
+    assert Counter(zip(*result[['locationID', 'label']].values.T)) == expected